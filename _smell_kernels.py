@@ -0,0 +1,79 @@
+"""
+Numba-compiled kernels for smell_detector, imported only once an input is
+large enough to repay loading Numba. Each kernel returns the same result as
+its pure-Python twin in smell_detector.
+"""
+
+from array import array
+from typing import List
+
+import numpy as np
+from numba import njit, types, uint64, int8, int32, int64
+
+# 64-bit FNV-1a parameters; must match FNV_OFFSET and FNV_PRIME in smell_detector
+_FNV_OFFSET_U64 = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME_U64 = np.uint64(0x100000001b3)
+# np.frombuffer over bytes yields a read-only view, accepted without a copy
+_READONLY_BYTES = types.Array(types.uint8, 1, 'C', readonly=True)
+
+@njit(uint64[::1](_READONLY_BYTES, int64[::1], int64, int64), cache=True, boundscheck=False)
+def _window_hashes_jit(data, bounds, min_lines, min_nonblank):
+    """Compiled twin of _window_hashes_py; line k spans data[bounds[k]:bounds[k + 1]]"""
+    n_lines = bounds.shape[0] - 1
+    line_hashes = np.empty(n_lines, dtype=np.uint64)
+    blank = np.empty(n_lines, dtype=np.bool_)
+    for k in range(n_lines):
+        # Trim the same ASCII whitespace as bytes.strip()
+        lo = bounds[k]
+        hi = bounds[k + 1]
+        while lo < hi and (data[lo] == 32 or 9 <= data[lo] <= 13):
+            lo += 1
+        while hi > lo and (data[hi - 1] == 32 or 9 <= data[hi - 1] <= 13):
+            hi -= 1
+        h = _FNV_OFFSET_U64
+        for p in range(lo, hi):
+            h = (h ^ np.uint64(data[p])) * _FNV_PRIME_U64
+        line_hashes[k] = h
+        blank[k] = lo == hi
+
+    # uint64 arithmetic wraps exactly like the masked Python ints
+    top = np.uint64(1)
+    for _ in range(min_lines - 1):
+        top *= _FNV_PRIME_U64
+    h = np.uint64(0)
+    nonblank = 0
+    for k in range(min_lines - 1):
+        h = h * _FNV_PRIME_U64 + line_hashes[k]
+        nonblank += not blank[k]
+    hashes = np.empty(n_lines - min_lines + 1, dtype=np.uint64)
+    for i in range(hashes.shape[0]):
+        last = i + min_lines - 1
+        if i:
+            h -= line_hashes[i - 1] * top
+            nonblank -= not blank[i - 1]
+        h = h * _FNV_PRIME_U64 + line_hashes[last]
+        nonblank += not blank[last]
+        if blank[i] or blank[last] or nonblank < min_nonblank:
+            hashes[i] = np.uint64(0)
+        else:
+            hashes[i] = h
+    return hashes
+
+def window_hashes(data: bytes, min_lines: int, min_nonblank: int) -> List[int]:
+    """Hash every min_lines window of data with the compiled kernel"""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    bounds = np.concatenate(([0], np.flatnonzero(buf == 0x0A) + 1, [len(data)])).astype(np.int64)
+    return _window_hashes_jit(buf, bounds, min_lines, min_nonblank).tolist()
+
+@njit(int64[:, ::1](int8[::1], int32[::1], int64), cache=True, boundscheck=False)
+def _count_accesses_jit(kinds, owners, n_methods):
+    """Compiled twin of _count_accesses_py"""
+    counts = np.zeros((n_methods, 2), dtype=np.int64)
+    for k in range(kinds.shape[0]):
+        counts[owners[k], kinds[k] >> 1] += 1
+    return counts
+
+def count_accesses(kinds: array, owners: array, n_methods: int) -> List[List[int]]:
+    """Count accesses per method with the compiled kernel"""
+    return _count_accesses_jit(np.frombuffer(kinds, dtype=np.int8),
+                               np.frombuffer(owners, dtype=np.int32), n_methods).tolist()
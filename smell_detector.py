@@ -5,42 +5,441 @@ Detects 6 common code smells in Python source code
 """
 
 import ast
+import dbm
 import os
+from array import array
+from bisect import bisect_left
 import sys
 import argparse
+import json
+import linecache
+import pickle
+import re
+import shelve
 import yaml
 from pathlib import Path
-from typing import List, Dict, Any, Set
-import re
+from typing import List, Dict, Any, Set, NamedTuple
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import islice
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# Bump when detection results change so persisted caches are invalidated
+DETECTOR_VERSION = '1.6'
+
+# 64-bit FNV-1a parameters, also used as the base of the rolling window hash
+FNV_OFFSET = 0xcbf29ce484222325
+FNV_PRIME = 0x100000001b3
+HASH_MASK = 0xFFFFFFFFFFFFFFFF
+
+# Importing Numba and loading the compiled kernels takes about 0.4s, while the
+# duplicate hash kernel saves about 0.1s per MB of source, so the kernels are
+# only used, and loaded, for inputs this large. Smaller inputs always take the
+# pure-Python path, so results never depend on which files came before
+JIT_MIN_BYTES = 4 << 20
+
+# The window hashes strip lines as bytes, which keeps these ASCII separators
+# and all non-ASCII whitespace that str.strip() removes
+_STR_ONLY_WHITESPACE = re.compile(rb'[\x1c-\x1f]')
+
+_kernels = None  # _smell_kernels once loaded, False when Numba is unavailable
+
+def _jit_kernels(size: int):
+    """The compiled kernels for an input of size bytes, or None when it is too small"""
+    global _kernels
+    if size < JIT_MIN_BYTES:
+        return None
+    if _kernels is None:
+        try:
+            import _smell_kernels
+        except ImportError:  # Numba is optional; the pure-Python kernels are used instead
+            _kernels = False
+        else:
+            _kernels = _smell_kernels
+    return _kernels or None
+
+def _fnv1a(data: bytes) -> int:
+    """64-bit FNV-1a hash of a byte string"""
+    h = FNV_OFFSET
+    for byte in data:
+        h = ((h ^ byte) * FNV_PRIME) & HASH_MASK
+    return h
+
+def _window_hashes_py(data: bytes, min_lines: int, min_nonblank: int) -> List[int]:
+    """Rolling hash of every window of min_lines consecutive lines of data.
+
+    Lines are hashed without surrounding whitespace. Windows that start or
+    end on a blank line, or hold fewer than min_nonblank non-blank lines,
+    hash to 0 so callers can skip them.
+    """
+    stripped = [line.strip() for line in data.split(b'\n')]
+    line_hashes = [_fnv1a(line) for line in stripped]
+    nonblank = sum(1 for line in stripped[:min_lines - 1] if line)
+    
+    # Polynomial hash of each window: roll in the new line's hash and
+    # roll out the contribution of the line leaving the window
+    top = pow(FNV_PRIME, min_lines - 1, HASH_MASK + 1)
+    h = 0
+    hashes = []
+    for k in range(min_lines - 1):
+        h = (h * FNV_PRIME + line_hashes[k]) & HASH_MASK
+    for i in range(len(stripped) - min_lines + 1):
+        last = i + min_lines - 1
+        if i:
+            h -= line_hashes[i - 1] * top
+            nonblank -= bool(stripped[i - 1])
+        h = (h * FNV_PRIME + line_hashes[last]) & HASH_MASK
+        nonblank += bool(stripped[last])
+        hashes.append(h if stripped[i] and stripped[last] and nonblank >= min_nonblank else 0)
+    return hashes
+
+def _window_hashes(data: bytes, min_lines: int, min_nonblank: int) -> List[int]:
+    """Hash every min_lines window of data, using the Numba kernel for large inputs"""
+    kernels = _jit_kernels(len(data))
+    if kernels is None:
+        return _window_hashes_py(data, min_lines, min_nonblank)
+    return kernels.window_hashes(data, min_lines, min_nonblank)
+
+# One record type per smell; tuples carry no per-instance dict and the file
+# path is interned, so large result sets stay small
+class LongMethodHit(NamedTuple):
+    name: str
+    line_range: str
+    length: int
+    file: str
+
+class GodClassHit(NamedTuple):
+    name: str
+    line_range: str
+    methods_count: int
+    attributes_count: int
+    file: str
+
+class DuplicationHit(NamedTuple):
+    line_1: int
+    line_2: int
+    length: int
+    file: str
+    
+    @property
+    def line_range_1(self) -> str:
+        return f"{self.line_1}-{self.line_1 + self.length - 1}"
+    
+    @property
+    def line_range_2(self) -> str:
+        return f"{self.line_2}-{self.line_2 + self.length - 1}"
+    
+    @property
+    def sample(self) -> str:
+        """Start of the duplicated block, read from the file only when asked for"""
+        linecache.checkcache(self.file)
+        block = ''.join(linecache.getline(self.file, line)
+                        for line in range(self.line_1, self.line_1 + self.length)).strip()
+        return block[:100] + '...' if len(block) > 100 else block
+
+class LargeParameterListHit(NamedTuple):
+    name: str
+    line: int
+    parameter_count: int
+    file: str
+
+class MagicNumberHit(NamedTuple):
+    line: int
+    number: float
+    file: str
+    
+    @property
+    def context(self) -> str:
+        """Source line of the number, read from the file only when asked for"""
+        linecache.checkcache(self.file)
+        return linecache.getline(self.file, self.line).strip()[:50]
+
+class FeatureEnvyHit(NamedTuple):
+    name: str
+    line: int
+    external_access: int
+    internal_access: int
+    file: str
+
+# Attribute access kinds recorded for feature envy; kind >> 1 is 0 for
+# internal (self/cls) and 1 for external accesses
+ACCESS_SELF, ACCESS_CLS, ACCESS_OTHER = 0, 1, 2
+
+def _count_accesses_py(kinds: array, owners: array, n_methods: int) -> List[List[int]]:
+    """Reduce access kinds to [internal, external] counts per owning method"""
+    counts = [[0, 0] for _ in range(n_methods)]
+    for kind, owner in zip(kinds, owners):
+        counts[owner][kind >> 1] += 1
+    return counts
+
+def _count_accesses(kinds: array, owners: array, n_methods: int, size: int) -> List[List[int]]:
+    """Count accesses per method, using the Numba kernel for a source of size bytes that is large"""
+    kernels = _jit_kernels(size)
+    if kernels is None:
+        return _count_accesses_py(kinds, owners, n_methods)
+    return kernels.count_accesses(kinds, owners, n_methods)
+
+# Only a few recent files are memoized: a CLI run analyzes each file once, so
+# a larger memo would only keep every AST alive; --persist-cache covers reuse
+# across runs
+@lru_cache(maxsize=4)
+def _parse_cached(file_path: str, mtime_ns: int, size: int):
+    """Read and parse a file once; mtime and size in the key invalidate stale entries.
+
+    The raw bytes are kept for the duplicate hash kernel, with newlines
+    normalized so that they line up with the AST line numbers.
+    """
+    raw = Path(file_path).read_bytes()
+    if b'\r' in raw:
+        raw = raw.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    source_code = raw.decode('utf-8')
+    tree = ast.parse(source_code, filename=file_path)
+    return tree, raw, source_code.split('\n')
+
+# Pushed onto the traversal stack to mark where a method's subtree ends
+_LEAVE_METHOD = object()
+
+class _SmellVisitor:
+    """Collects every AST-based smell of a file in a single traversal"""
+    
+    SMELLS = frozenset({'LongMethod', 'GodClass', 'LargeParameterList', 'MagicNumbers', 'FeatureEnvy'})
+    # Smells found from statements alone, so expressions can be skipped
+    STATEMENT_SMELLS = frozenset({'LongMethod', 'GodClass', 'LargeParameterList'})
+    # Fields holding statement lists; functions and classes only appear in these
+    STATEMENT_FIELDS = ('body', 'orelse', 'finalbody', 'handlers', 'cases')
+    
+    def __init__(self, config: Dict[str, Dict[str, Any]], enabled: Set[str], file_path: str,
+                 magic_excluded: Set[float], source_size: int):
+        self.enabled = enabled
+        self.file_path = file_path
+        # Size of the source in bytes, which decides whether the Numba kernels are used
+        self.source_size = source_size
+        # Thresholds are read once here rather than for every node
+        self.max_lines = config['LongMethod']['max_lines']
+        self.max_methods = config['GodClass']['max_methods']
+        self.max_attrs = config['GodClass']['max_attrs']
+        self.max_parameters = config['LargeParameterList']['max_parameters']
+        self.magic_excluded = magic_excluded
+        self.long_methods = []
+        self.god_classes = []
+        self.large_params = []
+        # (line, column, value) of every magic number literal
+        self.magic_numbers = []
+        # Methods checked for feature envy, the indices of those enclosing the
+        # current node, and one (kind, owner index) entry per attribute access
+        self.envy_methods = []
+        self.method_stack = []
+        self.access_kinds = array('b')
+        self.access_owners = array('i')
+        self.dispatch = {
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.AsyncFunctionDef: self.visit_FunctionDef,
+            ast.ClassDef: self.visit_ClassDef,
+            ast.Attribute: self.visit_Attribute,
+            ast.Constant: self.visit_Constant
+        }
+    
+    def results(self) -> Dict[str, List[tuple]]:
+        """Return the detections of the enabled smells"""
+        results = {
+            'LongMethod': self.long_methods,
+            'GodClass': self.god_classes,
+            'LargeParameterList': self.large_params,
+            'MagicNumbers': self._magic_number_detections(),
+            'FeatureEnvy': self._feature_envy_detections()
+        }
+        return {smell: found for smell, found in results.items() if smell in self.enabled}
+    
+    def run(self, tree: ast.AST) -> None:
+        """Visit tree depth-first in source order using an explicit stack.
+
+        Expressions are not descended into when no enabled smell needs them.
+        """
+        statements_only = self.enabled <= self.STATEMENT_SMELLS
+        dispatch = self.dispatch
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if node is _LEAVE_METHOD:
+                self.method_stack.pop()
+                continue
+            
+            visit = dispatch.get(node.__class__)
+            if visit is not None and visit(node):
+                stack.append(_LEAVE_METHOD)
+            
+            if statements_only:
+                children = [child for field in self.STATEMENT_FIELDS for child in getattr(node, field, ())]
+            else:
+                children = list(ast.iter_child_nodes(node))
+            children.reverse()
+            stack.extend(children)
+    
+    def _feature_envy_detections(self) -> List[tuple]:
+        """Build feature envy detections from the recorded attribute accesses"""
+        if not self.envy_methods:
+            return []
+        
+        feature_envy = []
+        counts = _count_accesses(self.access_kinds, self.access_owners, len(self.envy_methods),
+                                 self.source_size)
+        for node, (internal_access, external_access) in zip(self.envy_methods, counts):
+            # If more external access than internal, it might be feature envy
+            if external_access > internal_access and external_access > 2:
+                feature_envy.append(FeatureEnvyHit(node.name, node.lineno, external_access,
+                                                   internal_access, self.file_path))
+        return feature_envy
+    
+    def _magic_number_detections(self) -> List[tuple]:
+        """Build magic number detections in source order"""
+        self.magic_numbers.sort()
+        return [MagicNumberHit(line_num, num, self.file_path) for line_num, _, num in self.magic_numbers]
+    
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> bool:
+        """Check a function; returns True if it opens a method frame for feature envy"""
+        if 'LongMethod' in self.enabled:
+            # Calculate method length from the node's line span (end_lineno needs Python 3.8+)
+            start_line = node.lineno
+            end_line = node.end_lineno
+            method_length = end_line - start_line + 1
+            
+            if method_length > self.max_lines:
+                self.long_methods.append(LongMethodHit(node.name, f"{start_line}-{end_line}",
+                                                       method_length, self.file_path))
+        
+        if 'LargeParameterList' in self.enabled:
+            # Count parameters (excluding self/cls)
+            args = node.args
+            param_count = len(args.args) + len(args.kwonlyargs)
+            
+            if args.vararg:
+                param_count += 1
+            if args.kwarg:
+                param_count += 1
+            
+            # Subtract 1 for self in methods
+            if param_count > 0 and args.args and args.args[0].arg in ('self', 'cls'):
+                param_count -= 1
+            
+            if param_count > self.max_parameters:
+                self.large_params.append(LargeParameterListHit(node.name, node.lineno,
+                                                               param_count, self.file_path))
+        
+        # Only methods (with a self/cls parameter) are checked for feature envy
+        is_method = ('FeatureEnvy' in self.enabled and node.args.args and
+                     node.args.args[0].arg in ('self', 'cls'))
+        if is_method:
+            self.method_stack.append(len(self.envy_methods))
+            self.envy_methods.append(node)
+        return bool(is_method)
+    
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        if 'GodClass' not in self.enabled:
+            return
+        
+        methods = []
+        attributes = []
+        
+        # Count methods and class-level assignments
+        for item in node.body:
+            if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                methods.append(item.name)
+            elif isinstance(item, ast.Assign):
+                for target in item.targets:
+                    if isinstance(target, ast.Name):
+                        attributes.append(target.id)
+        
+        total_methods = len(methods)
+        total_attributes = len(attributes)
+        
+        if total_methods > self.max_methods or total_attributes > self.max_attrs:
+            self.god_classes.append(GodClassHit(node.name, f"{node.lineno}-{node.end_lineno}",
+                                                total_methods, total_attributes, self.file_path))
+    
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        # Accesses inside nested functions also count for every enclosing method
+        if self.method_stack and isinstance(node.value, ast.Name):
+            # self.attribute is internal, other.attribute is external
+            name = node.value.id
+            kind = ACCESS_SELF if name == 'self' else ACCESS_CLS if name == 'cls' else ACCESS_OTHER
+            for owner in self.method_stack:
+                self.access_kinds.append(kind)
+                self.access_owners.append(owner)
+    
+    def visit_Constant(self, node: ast.Constant) -> None:
+        num = node.value
+        if ('MagicNumbers' in self.enabled and isinstance(num, (int, float)) and
+                not isinstance(num, bool) and num not in self.magic_excluded):
+            self.magic_numbers.append((node.lineno, node.col_offset, num))
 
 class CodeSmellDetector:
     def __init__(self):
+        # Smells detected from the source text; the rest come from _SmellVisitor
         self.smell_handlers = {
-            'LongMethod': self.detect_long_methods,
-            'GodClass': self.detect_god_classes,
-            'DuplicatedCode': self.detect_duplicated_code,
-            'LargeParameterList': self.detect_large_parameter_lists,
-            'MagicNumbers': self.detect_magic_numbers,
-            'FeatureEnvy': self.detect_feature_envy
+            'DuplicatedCode': self.detect_duplicated_code
         }
         
         self.config = {
             'LongMethod': {'enabled': True, 'max_lines': 20},
             'GodClass': {'enabled': True, 'max_methods': 8, 'max_attrs': 6},
-            'DuplicatedCode': {'enabled': True, 'min_duplication_lines': 5},
+            'DuplicatedCode': {'enabled': True, 'min_duplication_lines': 5, 'min_nonblank_lines': 3,
+                               'max_results': 10},
             'LargeParameterList': {'enabled': True, 'max_parameters': 5},
             'MagicNumbers': {'enabled': True, 'excluded_numbers': [0, 1, -1, 100]},
             'FeatureEnvy': {'enabled': True}
         }
+        self._rebuild_dispatch()
+    
+    def _rebuild_dispatch(self) -> None:
+        """Precompute what detect_smells needs per file; called after every config change"""
+        self._active_smells = tuple(smell for smell, settings in self.config.items() if settings['enabled'])
+        self._active_handlers = tuple((smell, handler) for smell, handler in self.smell_handlers.items()
+                                      if self.config[smell]['enabled'])
+        self._visitor_smells = _SmellVisitor.SMELLS.intersection(self._active_smells)
+        # Literals are never negative in the AST (-1 is a unary minus applied to 1),
+        # so the exclusions are closed under negation for a single lookup per literal
+        excluded = frozenset(self.config['MagicNumbers']['excluded_numbers'])
+        self._magic_excluded = excluded | frozenset(-num for num in excluded)
     
     def load_config(self, config_path: str) -> None:
-        """Load configuration from YAML file"""
+        """Load configuration from a YAML, TOML or JSON file, picked by extension"""
         if os.path.exists(config_path):
-            with open(config_path, 'r') as f:
-                user_config = yaml.safe_load(f) or {}
-                for smell, settings in user_config.items():
-                    if smell in self.config:
-                        self.config[smell].update(settings)
+            suffix = Path(config_path).suffix.lower()
+            if suffix == '.json':
+                with open(config_path, 'r') as f:
+                    user_config = json.load(f)
+            elif suffix == '.toml':
+                if tomllib is None:
+                    raise ValueError(f"TOML configuration requires Python 3.11+: {config_path}")
+                with open(config_path, 'rb') as f:
+                    user_config = tomllib.load(f)
+            else:
+                with open(config_path, 'r') as f:
+                    user_config = yaml.load(f, Loader=_YamlLoader)
+            user_config = user_config or {}
+            if not isinstance(user_config, dict):
+                raise ValueError(f"expected a mapping of smell names to settings, got {type(user_config).__name__}")
+            for smell, settings in user_config.items():
+                if not isinstance(settings, dict):
+                    raise ValueError(f"settings for {smell} must be a mapping, got {type(settings).__name__}")
+            self.merge_config(user_config)
+    
+    def merge_config(self, user_config: Dict[str, Dict[str, Any]]) -> None:
+        """Merge per-smell settings into the current configuration"""
+        for smell, settings in user_config.items():
+            if smell in self.config:
+                self.config[smell].update(settings)
+        self._rebuild_dispatch()
     
     def update_config_from_cli(self, only_smells: List[str] = None, exclude_smells: List[str] = None) -> None:
         """Update configuration based on CLI flags"""
@@ -51,207 +450,122 @@ class CodeSmellDetector:
             for smell in exclude_smells:
                 if smell in self.config:
                     self.config[smell]['enabled'] = False
+        self._rebuild_dispatch()
     
-    def detect_smells(self, file_path: str) -> Dict[str, List[Dict]]:
+    def detect_smells(self, file_path: str) -> Dict[str, List[tuple]]:
         """Main method to detect all enabled code smells"""
-        with open(file_path, 'r', encoding='utf-8') as f:
-            source_code = f.read()
-        
+        st = os.stat(file_path)
         try:
-            tree = ast.parse(source_code)
+            tree, raw, lines = _parse_cached(file_path, st.st_mtime_ns, st.st_size)
         except SyntaxError as e:
             return {'error': f'Syntax error in {file_path}: {e}'}
         
+        # Hits keep an absolute path so their source lines can still be read
+        # when they come back from the persistent cache in another directory
+        file_path = sys.intern(os.path.abspath(file_path))
         smells_found = {}
         
-        for smell_name, handler in self.smell_handlers.items():
-            if self.config[smell_name]['enabled']:
-                smells_found[smell_name] = handler(tree, source_code, file_path)
-        
-        return smells_found
-    
-    def detect_long_methods(self, tree: ast.AST, source_code: str, file_path: str) -> List[Dict]:
-        """Detect methods longer than configured threshold"""
-        long_methods = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                # Calculate method length by counting lines
-                start_line = node.lineno
-                end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line
-                method_length = end_line - start_line + 1
-                
-                if method_length > self.config['LongMethod']['max_lines']:
-                    long_methods.append({
-                        'name': node.name,
-                        'line_range': f"{start_line}-{end_line}",
-                        'length': method_length,
-                        'file': file_path
-                    })
-        
-        return long_methods
-    
-    def detect_god_classes(self, tree: ast.AST, source_code: str, file_path: str) -> List[Dict]:
-        """Detect classes with too many methods and attributes"""
-        god_classes = []
+        if self._visitor_smells:
+            visitor = _SmellVisitor(self.config, self._visitor_smells, file_path, self._magic_excluded,
+                                    len(raw))
+            visitor.run(tree)
+            smells_found.update(visitor.results())
         
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                methods = []
-                attributes = []
-                
-                # Count methods and class-level assignments
-                for item in node.body:
-                    if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                        methods.append(item.name)
-                    elif isinstance(item, ast.Assign):
-                        for target in item.targets:
-                            if isinstance(target, ast.Name):
-                                attributes.append(target.id)
-                
-                total_methods = len(methods)
-                total_attributes = len(attributes)
-                
-                if (total_methods > self.config['GodClass']['max_methods'] or 
-                    total_attributes > self.config['GodClass']['max_attrs']):
-                    god_classes.append({
-                        'name': node.name,
-                        'line_range': f"{node.lineno}-{node.end_lineno}",
-                        'methods_count': total_methods,
-                        'attributes_count': total_attributes,
-                        'file': file_path
-                    })
+        for smell_name, handler in self._active_handlers:
+            smells_found[smell_name] = handler(tree, raw, lines, file_path)
         
-        return god_classes
+        # Keep the report in configuration order
+        return {smell: smells_found[smell] for smell in self._active_smells}
     
-    def detect_duplicated_code(self, tree: ast.AST, source_code: str, file_path: str) -> List[Dict]:
-        """Detect duplicated code blocks using simple pattern matching"""
-        lines = source_code.split('\n')
+    def detect_duplicated_code(self, tree: ast.AST, raw: bytes, lines: List[str], file_path: str) -> List[tuple]:
+        """Detect duplicated code blocks using a rolling hash over line windows"""
         duplicates = []
-        min_lines = self.config['DuplicatedCode']['min_duplication_lines']
+        settings = self.config['DuplicatedCode']
+        min_lines = settings['min_duplication_lines']
+        min_nonblank = settings['min_nonblank_lines']
+        max_results = settings['max_results']
+        n_windows = len(lines) - min_lines + 1
+        if min_lines < 1 or n_windows < 2:
+            return duplicates
         
-        # Simple line-based duplication detection
-        for i in range(len(lines) - min_lines):
-            block = '\n'.join(lines[i:i + min_lines]).strip()
-            if not block or len(block.split('\n')) < min_lines:
-                continue
-            
-            # Look for identical blocks later in the file
-            for j in range(i + min_lines, len(lines) - min_lines):
-                compare_block = '\n'.join(lines[j:j + min_lines]).strip()
-                if block == compare_block and block:
-                    duplicates.append({
-                        'line_range_1': f"{i+1}-{i+min_lines}",
-                        'line_range_2': f"{j+1}-{j+min_lines}",
-                        'file': file_path,
-                        'sample': block[:100] + '...' if len(block) > 100 else block
-                    })
-                    break  # Avoid reporting the same block multiple times
+        # Where bytes.strip() and str.strip() could disagree, hash the lines as
+        # stripped below so that hashing, blank lines and comparison all agree
+        if not raw.isascii() or _STR_ONLY_WHITESPACE.search(raw):
+            raw = '\n'.join([line.strip() for line in lines]).encode('utf-8')
         
-        return duplicates[:10]  # Limit results to avoid overwhelming output
-    
-    def detect_large_parameter_lists(self, tree: ast.AST, source_code: str, file_path: str) -> List[Dict]:
-        """Detect functions with too many parameters"""
-        large_params = []
-        max_params = self.config['LargeParameterList']['max_parameters']
+        # Blocks starting or ending on a blank line, or made up mostly of blank
+        # lines, hash to 0 and are not reported
+        hashes = _window_hashes(raw, min_lines, min_nonblank)
+        buckets = defaultdict(list)
+        for i, window_hash in enumerate(hashes):
+            if window_hash:
+                buckets[window_hash].append(i)
         
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                # Count parameters (excluding self/cls)
-                args = node.args
-                param_count = len(args.args) + len(args.kwonlyargs)
-                
-                if hasattr(args, 'vararg') and args.vararg:
-                    param_count += 1
-                if hasattr(args, 'kwarg') and args.kwarg:
-                    param_count += 1
-                
-                # Subtract 1 for self in methods
-                if param_count > 0 and node.args.args and node.args.args[0].arg in ('self', 'cls'):
-                    param_count -= 1
-                
-                if param_count > max_params:
-                    large_params.append({
-                        'name': node.name,
-                        'line': node.lineno,
-                        'parameter_count': param_count,
-                        'file': file_path
-                    })
-        
-        return large_params
-    
-    def detect_magic_numbers(self, tree: ast.AST, source_code: str, file_path: str) -> List[Dict]:
-        """Detect magic numbers in the code"""
-        magic_numbers = []
-        excluded = set(self.config['MagicNumbers']['excluded_numbers'])
-        
-        # Pattern to find numbers in source code (integers and floats)
-        number_pattern = r'\b(-?\d+\.?\d*)\b'
-        
-        lines = source_code.split('\n')
-        for line_num, line in enumerate(lines, 1):
-            numbers = re.findall(number_pattern, line)
-            for num_str in numbers:
-                try:
-                    # Try to convert to int or float
-                    if '.' in num_str:
-                        num = float(num_str)
+        # Pair each block with its first non-overlapping identical block later
+        # in the file; hash collisions are ruled out by comparing the stripped
+        # lines, which are only built for blocks sharing a hash. A pair that
+        # continues the previous window's pair one line further extends that
+        # hit, so a duplicated region is reported once rather than per offset.
+        # A hit stops growing before its two regions would overlap; the rest
+        # of the run is reported as further hits starting where the previous
+        # hit's second region does, as in repeated or periodic code. When the
+        # run ends before reaching that point, its last window is reported so
+        # the lines past the previous hit are still covered
+        prev_j = -1
+        tail = None  # (i, j) of the last window of the run not covered by a hit
+        for i in range(n_windows):
+            bucket = buckets.get(hashes[i])
+            if bucket and len(bucket) >= 2:
+                block_lines = [line.strip() for line in lines[i:i + min_lines]]
+                next_j = prev_j + 1
+                if (0 <= prev_j < n_windows - 1 and hashes[next_j] == hashes[i] and
+                        [line.strip() for line in lines[next_j:next_j + min_lines]] == block_lines):
+                    prev_j = next_j
+                    hit = duplicates[-1]
+                    if i + min_lines < hit.line_2:
+                        duplicates[-1] = hit._replace(length=hit.length + 1)
+                    elif i + 1 == hit.line_2:
+                        tail = None
+                        if len(duplicates) >= max_results:
+                            return duplicates
+                        duplicates.append(DuplicationHit(i + 1, next_j + 1, min_lines, file_path))
                     else:
-                        num = int(num_str)
-                    
-                    # Check if it's a magic number (not in excluded list)
-                    if num not in excluded and abs(num) not in excluded:
-                        magic_numbers.append({
-                            'line': line_num,
-                            'number': num,
-                            'context': line.strip()[:50],
-                            'file': file_path
-                        })
-                except ValueError:
+                        tail = (i, next_j)
                     continue
+            prev_j = -1
+            if tail is not None:
+                if len(duplicates) >= max_results:
+                    return duplicates
+                duplicates.append(DuplicationHit(tail[0] + 1, tail[1] + 1, min_lines, file_path))
+                tail = None
+            if not bucket or len(bucket) < 2:
+                continue
+            # Buckets are in ascending order, so skip straight to the first
+            # window that does not overlap this one
+            for j in islice(bucket, bisect_left(bucket, i + min_lines), None):
+                if [line.strip() for line in lines[j:j + min_lines]] == block_lines:
+                    if len(duplicates) >= max_results:
+                        return duplicates  # Limit results to avoid overwhelming output
+                    duplicates.append(DuplicationHit(i + 1, j + 1, min_lines, file_path))
+                    prev_j = j
+                    break
         
-        return magic_numbers
-    
-    def detect_feature_envy(self, tree: ast.AST, source_code: str, file_path: str) -> List[Dict]:
-        """Detect feature envy - methods that access more external data than internal"""
-        feature_envy_methods = []
-        
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                external_access = 0
-                internal_access = 0
-                
-                # Check if it's a method (has self parameter)
-                is_method = (node.args.args and 
-                           len(node.args.args) > 0 and 
-                           node.args.args[0].arg in ('self', 'cls'))
-                
-                if not is_method:
-                    continue  # Skip functions that aren't methods
-                
-                for item in ast.walk(node):
-                    if isinstance(item, ast.Attribute):
-                        # Check if accessing self.attribute (internal) or other.attribute (external)
-                        if (isinstance(item.value, ast.Name) and 
-                            item.value.id in ('self', 'cls')):
-                            internal_access += 1
-                        elif (isinstance(item.value, ast.Name) and 
-                              item.value.id not in ('self', 'cls')):
-                            external_access += 1
-                
-                # If more external access than internal, it might be feature envy
-                if external_access > internal_access and external_access > 2:
-                    feature_envy_methods.append({
-                        'name': node.name,
-                        'line': node.lineno,
-                        'external_access': external_access,
-                        'internal_access': internal_access,
-                        'file': file_path
-                    })
+        if tail is not None and len(duplicates) < max_results:
+            duplicates.append(DuplicationHit(tail[0] + 1, tail[1] + 1, min_lines, file_path))
         
-        return feature_envy_methods
+        return duplicates
+
+# Formats one detection of each smell as a report line
+_FORMATTERS = {
+    'LongMethod': lambda d: f"   📍 {d.name} (lines {d.line_range}) - {d.length} lines",
+    'GodClass': lambda d: f"   📍 {d.name} (lines {d.line_range}) - {d.methods_count} methods, {d.attributes_count} attributes",
+    'DuplicatedCode': lambda d: f"   📍 Duplication: lines {d.line_range_1} ↔ {d.line_range_2}",
+    'LargeParameterList': lambda d: f"   📍 {d.name} (line {d.line}) - {d.parameter_count} parameters",
+    'MagicNumbers': lambda d: f"   📍 Line {d.line}: number {d.number} - '{d.context}'",
+    'FeatureEnvy': lambda d: f"   📍 {d.name} (line {d.line}) - external: {d.external_access}, internal: {d.internal_access}"
+}
 
-def print_report(smells_found: Dict[str, List[Dict]], active_smells: List[str]) -> None:
+def print_report(smells_found: Dict[str, List[tuple]], active_smells: List[str]) -> None:
     """Print a formatted report of detected smells"""
     print("\n" + "="*80)
     print("CODE SMELL DETECTION REPORT")
@@ -265,19 +579,8 @@ def print_report(smells_found: Dict[str, List[Dict]], active_smells: List[str])
             print(f"🔍 {smell_name}: {len(detections)} found")
             total_smells += len(detections)
             
-            for detection in detections[:5]:  # Show first 5 detections per smell
-                if smell_name == 'LongMethod':
-                    print(f"   📍 {detection['name']} (lines {detection['line_range']}) - {detection['length']} lines")
-                elif smell_name == 'GodClass':
-                    print(f"   📍 {detection['name']} (lines {detection['line_range']}) - {detection['methods_count']} methods, {detection['attributes_count']} attributes")
-                elif smell_name == 'DuplicatedCode':
-                    print(f"   📍 Duplication: lines {detection['line_range_1']} ↔ {detection['line_range_2']}")
-                elif smell_name == 'LargeParameterList':
-                    print(f"   📍 {detection['name']} (line {detection['line']}) - {detection['parameter_count']} parameters")
-                elif smell_name == 'MagicNumbers':
-                    print(f"   📍 Line {detection['line']}: number {detection['number']} - '{detection['context']}'")
-                elif smell_name == 'FeatureEnvy':
-                    print(f"   📍 {detection['name']} (line {detection['line']}) - external: {detection['external_access']}, internal: {detection['internal_access']}")
+            # Show first 5 detections per smell
+            print('\n'.join(map(_FORMATTERS[smell_name], detections[:5])))
             if len(detections) > 5:
                 print(f"   ... and {len(detections) - 5} more")
             print()
@@ -289,6 +592,97 @@ def print_report(smells_found: Dict[str, List[Dict]], active_smells: List[str])
     
     print("="*80)
 
+def _analyze_one(file_path: str, config: Dict[str, Dict[str, Any]]) -> Dict[str, List[tuple]]:
+    """Worker entry point: detect smells with a fresh detector built from config"""
+    detector = CodeSmellDetector()
+    detector.merge_config(config)
+    return detector.detect_smells(file_path)
+
+# Record type of each smell's hits. The persistent cache stores hits as plain
+# tuples, so reading it never depends on how these classes were pickled
+_HIT_TYPES = {
+    'LongMethod': LongMethodHit,
+    'GodClass': GodClassHit,
+    'DuplicatedCode': DuplicationHit,
+    'LargeParameterList': LargeParameterListHit,
+    'MagicNumbers': MagicNumberHit,
+    'FeatureEnvy': FeatureEnvyHit
+}
+
+def _cache_key(file_path: str) -> str:
+    """Persistent cache key; entries written by other detector versions are never read"""
+    return f"{DETECTOR_VERSION}:{os.path.abspath(file_path)}"
+
+def _cache_stamp(detector: CodeSmellDetector, file_path: str) -> tuple:
+    """Everything a persisted result depends on besides the file path and version"""
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size, json.dumps(detector.config, sort_keys=True, default=str))
+
+def _store_cached(cache: shelve.Shelf, file_path: str, stamp: tuple,
+                  smells: Dict[str, List[tuple]]) -> None:
+    """Persist results for file_path with every hit reduced to a plain tuple"""
+    cache[_cache_key(file_path)] = (stamp, {smell: hits if smell == 'error' else [tuple(hit) for hit in hits]
+                                            for smell, hits in smells.items()})
+
+def _load_cached(cache: shelve.Shelf, file_path: str, stamp: tuple) -> Dict[str, List[tuple]]:
+    """Persisted results for file_path, or None when missing, stale or unreadable"""
+    try:
+        entry = cache.get(_cache_key(file_path))
+        if entry is None or entry[0] != stamp:
+            return None
+        return {smell: hits if smell == 'error' else [_HIT_TYPES[smell]._make(hit) for hit in hits]
+                for smell, hits in entry[1].items()}
+    except (pickle.UnpicklingError, AttributeError, EOFError, ImportError,
+            IndexError, KeyError, TypeError, ValueError):
+        # Left behind by an incompatible writer; recomputed and overwritten
+        return None
+
+def analyze_files(detector: CodeSmellDetector, file_paths: List[str], workers: int = None,
+                  cache: shelve.Shelf = None) -> Dict[str, Dict[str, List[tuple]]]:
+    """Detect smells in every file, spreading the files over worker processes.
+
+    Results for unchanged files are taken from cache when one is given; the
+    cache is only read and written here, never from the workers.
+    """
+    results = {}
+    stamps = {}
+    pending = []
+    for file_path in file_paths:
+        if cache is not None:
+            stamps[file_path] = stamp = _cache_stamp(detector, file_path)
+            cached = _load_cached(cache, file_path, stamp)
+            if cached is not None:
+                results[file_path] = cached
+                continue
+        pending.append(file_path)
+    
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_analyze_one, file_path, detector.config): file_path
+                       for file_path in pending}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    else:
+        for file_path in pending:
+            results[file_path] = detector.detect_smells(file_path)
+    
+    if cache is not None:
+        for file_path in pending:
+            _store_cached(cache, file_path, stamps[file_path], results[file_path])
+    
+    return results
+
+def _worker_count(value: str) -> int:
+    """argparse type for --workers: a whole number of at least 1"""
+    try:
+        count = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a whole number, got {value!r}")
+    if count < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {count}")
+    return count
+
 def main():
     parser = argparse.ArgumentParser(description='Detect code smells in Python source files')
     parser.add_argument('files', nargs='+', help='Python source files to analyze')
@@ -296,6 +690,11 @@ def main():
     parser.add_argument('--only', help='Only run specific smells (comma-separated)')
     parser.add_argument('--exclude', help='Exclude specific smells (comma-separated)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
+    parser.add_argument('--persist-cache', action='store_true',
+                        help='Reuse results for unchanged files from an on-disk cache')
+    parser.add_argument('--cache-path', default='.smell_cache', metavar='PATH',
+                        help='Location of the --persist-cache cache (default: .smell_cache)')
+    parser.add_argument('--workers', '-j', type=_worker_count, help='Number of worker processes (default: CPU count)')
     
     args = parser.parse_args()
     
@@ -304,7 +703,11 @@ def main():
     
     # Load configuration
     if os.path.exists(args.config):
-        detector.load_config(args.config)
+        try:
+            detector.load_config(args.config)
+        except (OSError, ValueError, yaml.YAMLError) as e:
+            print(f"Error loading configuration {args.config}: {e}")
+            sys.exit(1)
         if args.verbose:
             print(f"Loaded configuration from {args.config}")
     
@@ -321,7 +724,7 @@ def main():
         print(f"Active smells: {', '.join(active_smells)}")
     
     # Analyze each file
-    all_smells = {}
+    file_paths = []
     for file_path in args.files:
         if not os.path.exists(file_path):
             print(f"Warning: File {file_path} not found, skipping...")
@@ -329,9 +732,24 @@ def main():
         
         if args.verbose:
             print(f"Analyzing {file_path}...")
-        
-        smells = detector.detect_smells(file_path)
-        
+        file_paths.append(file_path)
+    
+    cache = None
+    if args.persist_cache:
+        try:
+            cache = shelve.open(args.cache_path)
+        except (OSError, *dbm.error) as e:
+            print(f"Error opening cache {args.cache_path}: {e}")
+            sys.exit(1)
+    try:
+        results = analyze_files(detector, file_paths, args.workers, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    
+    all_smells = {}
+    for file_path in file_paths:
+        smells = results[file_path]
         if 'error' in smells:
             print(f"Error analyzing {file_path}: {smells['error']}")
         else:
@@ -3,8 +3,21 @@
 Test the smell detector on our intentionally smelly code
 """
 
+import os
+import random
+import re
+import shelve
 import subprocess
 import sys
+import tempfile
+from array import array
+
+import smell_detector
+
+def _found_count(stdout, smell):
+    """Number of detections the report lists for one smell"""
+    match = re.search(rf"{smell}: (\d+) found", stdout)
+    return int(match.group(1)) if match else 0
 
 def test_detector():
     """Test the detector on the smelly code"""
@@ -36,6 +49,316 @@ def test_detector():
     
     print("STDOUT:")
     print(result2.stdout)
+    
+    # Test multiple files analyzed by worker processes
+    print("\n" + "="*60)
+    print("Testing multiple files with 2 workers...")
+    
+    result3 = subprocess.run([
+        sys.executable, 'smell_detector.py',
+        'smell_code.py', 'unit_tests.py',
+        '--workers', '2'
+    ], capture_output=True, text=True)
+    
+    print("STDOUT:")
+    print(result3.stdout)
+    if result3.stderr:
+        print("STDERR:")
+        print(result3.stderr)
+    
+    assert result3.returncode == 0, "Parallel run should exit cleanly"
+    smell_start = result3.stdout.find("File: smell_code.py")
+    tests_start = result3.stdout.find("File: unit_tests.py")
+    assert 0 <= smell_start < tests_start, "Reports should follow the command-line order"
+    
+    # The smell_code.py report must not depend on where it was computed
+    serial = subprocess.run([
+        sys.executable, 'smell_detector.py',
+        'smell_code.py',
+        '--workers', '1'
+    ], capture_output=True, text=True)
+    
+    assert serial.returncode == 0
+    serial_report = serial.stdout[serial.stdout.find("File: smell_code.py"):]
+    assert result3.stdout[smell_start:tests_start].strip() == serial_report.strip(), \
+        "Parallel and serial reports for smell_code.py should match"
+    
+    # Worker counts below 1 are rejected rather than read as a default
+    for workers in ('0', '-2'):
+        invalid = subprocess.run([
+            sys.executable, 'smell_detector.py',
+            'smell_code.py',
+            '--workers', workers
+        ], capture_output=True, text=True)
+        assert invalid.returncode == 2, workers
+        assert "must be at least 1" in invalid.stderr, invalid.stderr
+
+def test_config_formats():
+    """JSON and TOML configs are picked by extension and override the defaults"""
+    print("Testing JSON and TOML configuration files...")
+    
+    default = subprocess.run([
+        sys.executable, 'smell_detector.py',
+        'smell_code.py',
+        '--only', 'LongMethod'
+    ], capture_output=True, text=True)
+    assert default.returncode == 0
+    default_count = _found_count(default.stdout, 'LongMethod')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'config.json')
+        with open(json_path, 'w') as f:
+            f.write('{"LongMethod": {"max_lines": 1}}')
+        toml_path = os.path.join(tmp, 'config.toml')
+        with open(toml_path, 'w') as f:
+            f.write('[LongMethod]\nmax_lines = 1\n')
+        
+        for config_path in (json_path, toml_path):
+            result = subprocess.run([
+                sys.executable, 'smell_detector.py',
+                'smell_code.py',
+                '--only', 'LongMethod',
+                '-c', config_path
+            ], capture_output=True, text=True)
+            
+            if config_path.endswith('.toml') and smell_detector.tomllib is None:
+                assert result.returncode != 0
+                assert "TOML configuration requires Python 3.11+" in result.stdout
+                assert "Traceback" not in result.stderr
+                continue
+            
+            assert result.returncode == 0, result.stderr
+            assert _found_count(result.stdout, 'LongMethod') > default_count, \
+                f"max_lines from {config_path} should take effect"
+        
+        # A malformed config, or one that does not map smells to settings, is
+        # reported on one line instead of a traceback
+        for name, content in (('bad.json', '{"LongMethod": '), ('list.yaml', '- a\n'),
+                              ('list.json', '[1, 2]'), ('scalar.yaml', 'LongMethod: 5\n')):
+            bad_path = os.path.join(tmp, name)
+            with open(bad_path, 'w') as f:
+                f.write(content)
+            result = subprocess.run([
+                sys.executable, 'smell_detector.py',
+                'smell_code.py',
+                '-c', bad_path
+            ], capture_output=True, text=True)
+            assert result.returncode == 1, name
+            assert result.stdout.startswith(f"Error loading configuration {bad_path}:"), name
+            assert "Traceback" not in result.stderr, name
+        
+        # Without tomllib a TOML config is rejected rather than misread as YAML
+        saved_tomllib = smell_detector.tomllib
+        smell_detector.tomllib = None
+        try:
+            smell_detector.CodeSmellDetector().load_config(toml_path)
+        except ValueError as e:
+            assert "Python 3.11+" in str(e)
+        else:
+            assert False, "TOML config should need tomllib"
+        finally:
+            smell_detector.tomllib = saved_tomllib
+    
+    print("✓ Configuration formats test passed!")
+
+def test_duplication_limits():
+    """max_results and min_nonblank_lines change how many duplicates are reported"""
+    print("Testing DuplicatedCode result limits...")
+    
+    def run(source_path, settings, tmp):
+        config_path = os.path.join(tmp, 'config.json')
+        with open(config_path, 'w') as f:
+            f.write('{"DuplicatedCode": %s}' % settings)
+        result = subprocess.run([
+            sys.executable, 'smell_detector.py',
+            source_path,
+            '--only', 'DuplicatedCode',
+            '-c', config_path
+        ], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        return _found_count(result.stdout, 'DuplicatedCode')
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        assert run('smell_code.py', '{"max_results": 10}', tmp) > 1
+        assert run('smell_code.py', '{"max_results": 1}', tmp) == 1
+        
+        # A repeated block that is mostly blank lines
+        sparse_path = os.path.join(tmp, 'sparse.py')
+        with open(sparse_path, 'w') as f:
+            f.write('a = 1\n\n\n\nb = 2\nc = 3\na = 1\n\n\n\nb = 2\n')
+        assert run(sparse_path, '{"min_nonblank_lines": 0}', tmp) == 1
+        assert run(sparse_path, '{"min_nonblank_lines": 3}', tmp) == 0
+        
+        # Copies differing only in whitespace that str.strip() removes, kept
+        # in a string since such characters are not valid in code
+        block = 'a = 1\nb = 2\nc = 3\nd = 4\ne = 5\n'
+        for space in ('\xa0', '\x1c', '\u3000'):
+            spaced_path = os.path.join(tmp, 'spaced.py')
+            with open(spaced_path, 'w', encoding='utf-8') as f:
+                f.write('text = """\n' + block + 'pass\n' + block.replace('c = 3', 'c = 3' + space) + '"""\n')
+            assert run(spaced_path, '{}', tmp) == 1, repr(space)
+    
+    print("✓ Duplication limits test passed!")
+
+def test_duplication_regions_do_not_overlap():
+    """Runs of repeated code are reported as non-overlapping regions"""
+    print("Testing DuplicatedCode on repeated blocks...")
+    
+    block = 'x = 1\ny = 2\nz = 3\nu = 4\nv = 5\nw = 6\n'
+    cases = {
+        # Periodic code, every line repeating five lines later
+        'periodic.py': (''.join(f'a{k % 5} = {k % 5}\n' for k in range(25)),
+                        [('1-5', '6-10'), ('6-10', '11-15'), ('11-15', '16-20'), ('16-20', '21-25')]),
+        # Three copies of one block separated by a statement
+        'copies.py': (block + 'pass\n' + block + 'pass\n' + block,
+                      [('1-7', '8-14'), ('8-13', '15-20')]),
+        # A repeated block followed by one more repeated line
+        'tail.py': ('a = 1\nb = 2\nc = 3\nd = 4\ne = 5\n' * 2 + 'a = 1\n',
+                    [('1-5', '6-10'), ('2-6', '7-11')])
+    }
+    
+    detector = smell_detector.CodeSmellDetector()
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (source, expected) in cases.items():
+            path = os.path.join(tmp, name)
+            with open(path, 'w') as f:
+                f.write(source)
+            hits = detector.detect_smells(path)['DuplicatedCode']
+            for hit in hits:
+                assert hit.line_1 + hit.length <= hit.line_2, f"{name}: {hit} overlaps itself"
+            assert [(hit.line_range_1, hit.line_range_2) for hit in hits] == expected, name
+    
+    print("✓ Duplication overlap test passed!")
+
+def test_magic_numbers():
+    """Only numeric literals in code count; strings, comments, bools and exclusions don't"""
+    print("Testing MagicNumbers on a small file...")
+    
+    source = (
+        'x = 42  # 7\n'
+        's = "99"\n'
+        'def f():\n'
+        '    """Returns 13"""\n'
+        '    return -1 + 0\n'
+        'flag = True\n'
+        'ratio = -2.5\n'
+    )
+    
+    detector = smell_detector.CodeSmellDetector()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'numbers.py')
+        with open(path, 'w') as f:
+            f.write(source)
+        hits = detector.detect_smells(path)['MagicNumbers']
+    
+    # Literals carry no sign in the AST, so -2.5 is reported as 2.5
+    assert [(hit.line, hit.number) for hit in hits] == [(1, 42), (7, 2.5)]
+    
+    print("✓ Magic numbers test passed!")
+
+def test_persistent_cache():
+    """Cached results match a fresh run and incompatible entries are recomputed"""
+    print("Testing the persistent result cache...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, 'cache')
+        
+        def run():
+            result = subprocess.run([
+                sys.executable, 'smell_detector.py',
+                'smell_code.py',
+                '--persist-cache', '--cache-path', cache_path
+            ], capture_output=True, text=True)
+            assert result.returncode == 0, result.stderr
+            return result.stdout
+        
+        fresh = run()
+        assert run() == fresh, "Cached results should match the fresh run"
+        
+        # Entries hold plain tuples, so they load outside the CLI's __main__
+        key = smell_detector._cache_key('smell_code.py')
+        with shelve.open(cache_path) as cache:
+            stamp, smells = cache[key]
+            assert all(type(hit) is tuple for hit in smells['MagicNumbers'])
+            # Simulate hit records written by an older layout of the record classes
+            smells['MagicNumbers'] = [hit + (None,) for hit in smells['MagicNumbers']]
+            cache[key] = (stamp, smells)
+        assert run() == fresh, "Entries with an old record layout should be recomputed"
+        
+        # An entry that cannot be unpickled at all is a miss as well
+        with shelve.open(cache_path) as cache:
+            cache.dict[key.encode()] = b'\x80\x04cno_such_module\nGone\n.'
+        assert run() == fresh, "Unreadable entries should be recomputed"
+        
+        # A cache in a missing directory is reported on one line instead of a traceback
+        missing_path = os.path.join(tmp, 'missing', 'cache')
+        result = subprocess.run([
+            sys.executable, 'smell_detector.py',
+            'smell_code.py',
+            '--persist-cache', '--cache-path', missing_path
+        ], capture_output=True, text=True)
+        assert result.returncode == 1
+        assert result.stdout.startswith(f"Error opening cache {missing_path}:")
+        assert "Traceback" not in result.stderr
+    
+    print("✓ Persistent cache test passed!")
+
+def test_kernels_match():
+    """The compiled kernels return exactly what their pure-Python twins do"""
+    print("Testing compiled kernels against the pure-Python fallbacks...")
+    
+    try:
+        import _smell_kernels
+    except ImportError:
+        print("Numba not installed, skipping")
+        return
+    
+    rng = random.Random(0)
+    for _ in range(50):
+        data = bytes(rng.choice(b'ab \t\n\n') for _ in range(rng.randrange(0, 400)))
+        for min_lines in (1, 3, 5):
+            for min_nonblank in (0, 3):
+                if data.count(b'\n') + 1 < min_lines:
+                    continue
+                assert (_smell_kernels.window_hashes(data, min_lines, min_nonblank) ==
+                        smell_detector._window_hashes_py(data, min_lines, min_nonblank))
+    
+    for _ in range(50):
+        n_methods = rng.randrange(1, 10)
+        size = rng.randrange(0, 200)
+        kinds = array('b', (rng.randrange(3) for _ in range(size)))
+        owners = array('i', (rng.randrange(n_methods) for _ in range(size)))
+        assert (_smell_kernels.count_accesses(kinds, owners, n_methods) ==
+                smell_detector._count_accesses_py(kinds, owners, n_methods))
+    
+    print("✓ Kernel equivalence test passed!")
+
+def test_kernel_dispatch():
+    """Only inputs of JIT_MIN_BYTES or more use the compiled kernels, whatever ran before"""
+    print("Testing which inputs use the compiled kernels...")
+    
+    class FakeKernels:
+        def count_accesses(self, kinds, owners, n_methods):
+            return 'compiled'
+    
+    kinds = array('b', [smell_detector.ACCESS_OTHER])
+    owners = array('i', [0])
+    saved_kernels = smell_detector._kernels
+    smell_detector._kernels = FakeKernels()
+    try:
+        assert smell_detector._count_accesses(kinds, owners, 1, smell_detector.JIT_MIN_BYTES) == 'compiled'
+        assert smell_detector._count_accesses(kinds, owners, 1, 100) == [[0, 1]]
+    finally:
+        smell_detector._kernels = saved_kernels
+    
+    print("✓ Kernel dispatch test passed!")
 
 if __name__ == '__main__':
-    test_detector()
\ No newline at end of file
+    test_detector()
+    test_config_formats()
+    test_duplication_limits()
+    test_duplication_regions_do_not_overlap()
+    test_magic_numbers()
+    test_persistent_cache()
+    test_kernels_match()
+    test_kernel_dispatch()